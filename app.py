@@ -1,9 +1,12 @@
 import csv
+import os
 from pathlib import Path
+from typing import NamedTuple, TextIO, Tuple
 
+import pandas as pd
 import streamlit as st
 
-from src.egfr import compute_kidney_function
+from src.egfr import KidneyResult, compute_kidney_function
 
 # ============== App config ==============
 st.set_page_config(page_title="eGFR / CrCl Calculator", page_icon="🩺", layout="wide")
@@ -12,14 +15,107 @@ DATA_DIR = Path("data")
 DATA_DIR.mkdir(exist_ok=True)
 HISTORY_FILE = DATA_DIR / "kidney_history.csv"
 
+HISTORY_TABLE_MAX_ROWS = 100
+
+HISTORY_FIELDS = (
+    "timestamp",
+    "method",
+    "age",
+    "sex",
+    "scr_value",
+    "scr_unit",
+    "scr_mgdl",
+    "black",
+    "weight_kg",
+    "value",
+    "value_unit",
+    "stage",
+    "stage_text",
+    "notes",
+)
+
+# khai báo sẵn kiểu cột để bỏ bước suy luận kiểu khi đọc CSV;
+# dùng kiểu hẹp (int16/float32/category) vì giá trị lâm sàng nằm trong khoảng nhỏ
+HISTORY_DTYPES = {
+    "timestamp": "string",
+    "method": "category",
+    "age": "int16",
+    "sex": "category",
+    "scr_value": "float32",
+    "scr_unit": "category",
+    "scr_mgdl": "float32",
+    "black": "boolean",
+    "weight_kg": "float32",
+    "value": "float32",
+    "value_unit": "category",
+    "stage": "category",
+    "stage_text": "category",
+    "notes": "category",
+}
+
+
+def _history_writer() -> Tuple[TextIO, csv.DictWriter]:
+    # giữ file mở trong session_state để không phải open lại mỗi lần lưu;
+    # nếu file đã bị xoá / đổi tên / thay thế (khác inode với file đang mở) thì mở lại.
+    # Không có hook kết thúc phiên: file cũ chỉ được đóng khi mở lại hoặc khi bị thu gom rác.
+    try:
+        path_stat = HISTORY_FILE.stat()
+    except FileNotFoundError:
+        path_stat = None
+
+    entry = st.session_state.get("_history_writer")
+    if entry is not None:
+        open_stat = os.fstat(entry[0].fileno())
+        if path_stat is not None and (path_stat.st_dev, path_stat.st_ino) == (open_stat.st_dev, open_stat.st_ino):
+            return entry
+        entry[0].close()
+
+    f = HISTORY_FILE.open("a", newline="", encoding="utf-8")
+    writer = csv.DictWriter(f, fieldnames=HISTORY_FIELDS)
+    if path_stat is None:
+        writer.writeheader()
+    entry = (f, writer)
+    st.session_state._history_writer = entry
+    return entry
+
 
 def save_history_row(row: dict) -> None:
-    file_exists = HISTORY_FILE.exists()
-    with HISTORY_FILE.open("a", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=list(row.keys()))
-        if not file_exists:
-            writer.writeheader()
-        writer.writerow(row)
+    f, writer = _history_writer()
+    writer.writerow(row)
+    f.flush()
+
+
+STAGE_ORDER = ("G1", "G2", "G3a", "G3b", "G4", "G5")
+
+
+class ResultDisplay(NamedTuple):
+    metric_label: str
+    metric_value: str
+    stage_line: str
+    caption: str
+    notes: str
+    progress: float
+
+
+def render_result(res: KidneyResult) -> ResultDisplay:
+    # định dạng chuỗi hiển thị một lần khi có kết quả mới, không lặp lại ở mỗi lần rerun
+    idx = STAGE_ORDER.index(res.stage)
+    return ResultDisplay(
+        f"Kết quả ({res.method})",
+        f"{res.value:.1f} {res.value_unit}",
+        f"**Phân độ (G1–G5):** {res.stage} — {res.stage_text}",
+        f"Creatinine quy đổi: **{res.scr_mgdl:.3f} mg/dL** | Thời điểm: {res.timestamp}",
+        res.notes,
+        (idx + 1) / len(STAGE_ORDER),
+    )
+
+
+# chỉ khoá mới nhất còn được dùng lại (mỗi lần lưu đổi mtime/size) -> giữ một bản
+@st.cache_data(max_entries=1, show_spinner=False)
+def _load_history(mtime_ns: int, size: int) -> pd.DataFrame:
+    # (mtime_ns, size) chỉ dùng làm khoá cache: file đổi -> khoá đổi -> đọc lại.
+    # engine="pyarrow": giải mã CSV theo cột (C++), không dựng dict từng dòng
+    return pd.read_csv(HISTORY_FILE, encoding="utf-8", engine="pyarrow", dtype=HISTORY_DTYPES)
 
 
 st.title("🩺 Công cụ tính eGFR / CrCl (nhiều công thức)")
@@ -78,11 +174,8 @@ with tab_calc:
     with right:
         st.subheader("Kết quả")
 
-        if "kidney_result" not in st.session_state:
-            st.session_state.kidney_result = None
-
         if clear_btn:
-            st.session_state.kidney_result = None
+            st.session_state.kidney_display = None
 
         if calc_btn or save_btn:
             try:
@@ -95,7 +188,7 @@ with tab_calc:
                     black=bool(black),
                     weight_kg=weight_kg,
                 )
-                st.session_state.kidney_result = res
+                st.session_state.kidney_display = render_result(res)
 
                 if save_btn:
                     save_history_row(
@@ -121,32 +214,34 @@ with tab_calc:
             except Exception as e:
                 st.error(str(e))
 
-        res = st.session_state.kidney_result
-        if res is None:
+        # trạng thái "chưa có kết quả" chỉ tốn một lần tra session_state
+        display = st.session_state.get("kidney_display")
+        if display is None:
             st.info("Nhập thông tin bên trái và bấm **Tính**.")
         else:
-            st.metric(f"Kết quả ({res.method})", f"{res.value:.1f} {res.value_unit}")
-            st.write(f"**Phân độ (G1–G5):** {res.stage} — {res.stage_text}")
-            st.caption(f"Creatinine quy đổi: **{res.scr_mgdl:.3f} mg/dL** | Thời điểm: {res.timestamp}")
-            st.info(res.notes)
+            st.metric(display.metric_label, display.metric_value)
+            st.write(display.stage_line)
+            st.caption(display.caption)
+            st.info(display.notes)
 
             # thanh mức độ (G1 -> G5)
-            stage_order = ["G1", "G2", "G3a", "G3b", "G4", "G5"]
-            idx = stage_order.index(res.stage)
-            st.progress((idx + 1) / len(stage_order), text="Mức độ giảm chức năng thận (G1 → G5)")
+            st.progress(display.progress, text="Mức độ giảm chức năng thận (G1 → G5)")
 
 with tab_history:
     st.subheader("Lịch sử tính toán")
     if HISTORY_FILE.exists():
         st.write(f"File: `{HISTORY_FILE.as_posix()}`")
-        st.dataframe(
-            list(csv.DictReader(HISTORY_FILE.open("r", encoding="utf-8"))),
-            use_container_width=True,
-            height=420,
-        )
+        stat = HISTORY_FILE.stat()
+        history = _load_history(stat.st_mtime_ns, stat.st_size)
+        # lịch sử ngắn: bảng tĩnh (HTML) nhẹ hơn widget dataframe tương tác
+        if len(history) <= HISTORY_TABLE_MAX_ROWS:
+            st.table(history)
+        else:
+            st.dataframe(history, use_container_width=True, height=420)
         st.download_button(
             "Tải lịch sử CSV",
-            data=HISTORY_FILE.read_bytes(),
+            # truyền hàm thay vì bytes: chỉ đọc file khi người dùng thực sự bấm tải
+            data=HISTORY_FILE.read_bytes,
             file_name="kidney_history.csv",
             mime="text/csv",
             use_container_width=True,
@@ -1,8 +1,14 @@
 from __future__ import annotations
 
+import math
+from bisect import bisect_right
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Literal, Optional, Tuple
+from functools import lru_cache
+from typing import Callable, Dict, Final, Literal, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
 
 
 Sex = Literal["male", "female"]
@@ -12,34 +18,90 @@ Method = Literal["CKD-EPI 2021", "CKD-EPI 2009", "MDRD (IDMS)", "Cockcroft-Gault
 
 def scr_to_mgdl(scr_value: float, unit: ScrUnit) -> float:
     """µmol/L -> mg/dL: chia 88.4"""
-    if scr_value <= 0:
+    if not scr_value > 0:  # dạng phủ định để loại cả NaN
         raise ValueError("Creatinine phải > 0.")
     if unit == "umol/L":
         return scr_value / 88.4
     return scr_value
 
 
+# ngưỡng KDIGO tăng dần; _GFR_STAGES[i] ứng với khoảng [_GFR_THRESHOLDS[i-1], _GFR_THRESHOLDS[i])
+_GFR_THRESHOLDS: Final[Tuple[float, ...]] = (15.0, 30.0, 45.0, 60.0, 90.0)
+_GFR_STAGES: Final[Tuple[Tuple[str, str], ...]] = (
+    ("G5", "Suy thận giai đoạn cuối (<15)"),
+    ("G4", "Giảm nặng (15–29)"),
+    ("G3b", "Giảm vừa–nặng (30–44)"),
+    ("G3a", "Giảm nhẹ–vừa (45–59)"),
+    ("G2", "Giảm nhẹ (60–89)"),
+    ("G1", "Bình thường / cao (≥90)"),
+)
+
+
 def gfr_stage_g1_g5(gfr: float) -> Tuple[str, str]:
     """
     Phân độ GFR theo KDIGO (G1–G5) dựa trên eGFR (mL/min/1.73m²).
     Lưu ý: Với Cockcroft–Gault (CrCl, mL/min) dùng phân độ này chỉ mang tính gần đúng.
     """
-    if gfr >= 90:
-        return "G1", "Bình thường / cao (≥90)"
-    if gfr >= 60:
-        return "G2", "Giảm nhẹ (60–89)"
-    if gfr >= 45:
-        return "G3a", "Giảm nhẹ–vừa (45–59)"
-    if gfr >= 30:
-        return "G3b", "Giảm vừa–nặng (30–44)"
-    if gfr >= 15:
-        return "G4", "Giảm nặng (15–29)"
-    return "G5", "Suy thận giai đoạn cuối (<15)"
+    # bisect_right: giá trị đúng bằng ngưỡng thuộc độ cao hơn (gfr >= 90 -> G1)
+    return _GFR_STAGES[bisect_right(_GFR_THRESHOLDS, gfr)]
 
 
 # -------------------------
 # eGFR equations
 # -------------------------
+# Lõi tính toán thuần (không phụ thuộc thời gian) được cache theo bộ tham số:
+# Streamlit chạy lại script mỗi lần tương tác nên cùng một bộ input bị tính lại nhiều lần.
+# Điều kiện tuổi (>=18) được kiểm tra một lần ở compute_kidney_function(_batch).
+# Các luỹ thừa được gộp trong miền log: a^x * b^y * c^z = exp(x·ln a + y·ln b + z·ln c).
+
+_LOG_0_9938: Final[float] = math.log(0.9938)
+_LOG_0_993: Final[float] = math.log(0.993)
+
+
+@lru_cache(maxsize=1024)
+def _ckd_epi_2021_core(scr_mgdl: float, age: int, female: bool) -> float:
+    kappa = 0.7 if female else 0.9
+    alpha = -0.241 if female else -0.302
+    female_factor = 1.012 if female else 1.0
+
+    ratio = scr_mgdl / kappa
+    mn = ratio if ratio < 1.0 else 1.0
+    mx = ratio if ratio > 1.0 else 1.0
+
+    log_mn, log_mx = math.log(mn), math.log(mx)
+    return 142.0 * math.exp(alpha * log_mn - 1.200 * log_mx + age * _LOG_0_9938) * female_factor
+
+
+@lru_cache(maxsize=1024)
+def _ckd_epi_2009_core(scr_mgdl: float, age: int, female: bool, black: bool) -> float:
+    kappa = 0.7 if female else 0.9
+    alpha = -0.329 if female else -0.411
+
+    ratio = scr_mgdl / kappa
+    mn = ratio if ratio < 1.0 else 1.0
+    mx = ratio if ratio > 1.0 else 1.0
+
+    female_factor = 1.018 if female else 1.0
+    black_factor = 1.159 if black else 1.0
+
+    log_mn, log_mx = math.log(mn), math.log(mx)
+    return 141.0 * math.exp(alpha * log_mn - 1.209 * log_mx + age * _LOG_0_993) * female_factor * black_factor
+
+
+@lru_cache(maxsize=1024)
+def _mdrd_idms_core(scr_mgdl: float, age: int, female: bool, black: bool) -> float:
+    female_factor = 0.742 if female else 1.0
+    black_factor = 1.212 if black else 1.0
+    return 175.0 * math.exp(-1.154 * math.log(scr_mgdl) - 0.203 * math.log(age)) * female_factor * black_factor
+
+
+@lru_cache(maxsize=1024)
+def _cockcroft_gault_core(scr_mgdl: float, age: int, female: bool, weight_kg: float) -> float:
+    crcl = ((140.0 - age) * weight_kg) / (72.0 * scr_mgdl)
+    if female:
+        crcl *= 0.85
+    return crcl
+
 
 def egfr_ckd_epi_2021(scr_mgdl: float, age: int, sex: Sex) -> float:
     """
@@ -48,17 +110,7 @@ def egfr_ckd_epi_2021(scr_mgdl: float, age: int, sex: Sex) -> float:
     κ = 0.7 female / 0.9 male
     α = -0.241 female / -0.302 male
     """
-    if age < 18:
-        raise ValueError("CKD-EPI 2021: áp dụng cho người lớn (>=18 tuổi).")
-    kappa = 0.7 if sex == "female" else 0.9
-    alpha = -0.241 if sex == "female" else -0.302
-    female_factor = 1.012 if sex == "female" else 1.0
-
-    ratio = scr_mgdl / kappa
-    mn = min(ratio, 1.0)
-    mx = max(ratio, 1.0)
-
-    return 142.0 * (mn ** alpha) * (mx ** -1.200) * (0.9938 ** age) * female_factor
+    return _ckd_epi_2021_core(scr_mgdl, age, sex == "female")
 
 
 def egfr_ckd_epi_2009(scr_mgdl: float, age: int, sex: Sex, black: bool = False) -> float:
@@ -68,19 +120,7 @@ def egfr_ckd_epi_2009(scr_mgdl: float, age: int, sex: Sex, black: bool = False)
     κ = 0.7 female / 0.9 male
     α = -0.329 female / -0.411 male
     """
-    if age < 18:
-        raise ValueError("CKD-EPI 2009: áp dụng cho người lớn (>=18 tuổi).")
-    kappa = 0.7 if sex == "female" else 0.9
-    alpha = -0.329 if sex == "female" else -0.411
-
-    ratio = scr_mgdl / kappa
-    mn = min(ratio, 1.0)
-    mx = max(ratio, 1.0)
-
-    female_factor = 1.018 if sex == "female" else 1.0
-    black_factor = 1.159 if black else 1.0
-
-    return 141.0 * (mn ** alpha) * (mx ** -1.209) * (0.993 ** age) * female_factor * black_factor
+    return _ckd_epi_2009_core(scr_mgdl, age, sex == "female", bool(black))
 
 
 def egfr_mdrd_idms(scr_mgdl: float, age: int, sex: Sex, black: bool = False) -> float:
@@ -88,11 +128,7 @@ def egfr_mdrd_idms(scr_mgdl: float, age: int, sex: Sex, black: bool = False) ->
     MDRD 4-variable (IDMS-traceable):
     eGFR = 175 * Scr^-1.154 * Age^-0.203 * (0.742 if female) * (1.212 if black)
     """
-    if age < 18:
-        raise ValueError("MDRD: áp dụng cho người lớn (>=18 tuổi).")
-    female_factor = 0.742 if sex == "female" else 1.0
-    black_factor = 1.212 if black else 1.0
-    return 175.0 * (scr_mgdl ** -1.154) * (age ** -0.203) * female_factor * black_factor
+    return _mdrd_idms_core(scr_mgdl, age, sex == "female", bool(black))
 
 
 def crcl_cockcroft_gault(scr_mgdl: float, age: int, sex: Sex, weight_kg: float) -> float:
@@ -100,17 +136,153 @@ def crcl_cockcroft_gault(scr_mgdl: float, age: int, sex: Sex, weight_kg: float)
     Cockcroft–Gault creatinine clearance (CrCl) mL/min (KHÔNG chuẩn hoá 1.73m²):
     CrCl = ((140 - age) * weight_kg) / (72 * Scr) * (0.85 if female)
     """
-    if age < 18:
-        raise ValueError("Cockcroft–Gault: thường dùng cho người lớn (>=18 tuổi).")
-    if weight_kg <= 0:
+    if not weight_kg > 0:  # dạng phủ định để loại cả NaN
         raise ValueError("Cân nặng phải > 0.")
+    return _cockcroft_gault_core(scr_mgdl, age, sex == "female", weight_kg)
+
+
+# -------------------------
+# Vectorized equations (batch, NumPy)
+# -------------------------
+
+def egfr_ckd_epi_2021_vec(scr_mgdl: np.ndarray, age: np.ndarray, female: np.ndarray) -> np.ndarray:
+    """CKD-EPI 2021 cho mảng (female: mặt nạ bool sex == "female")."""
+    kappa = np.where(female, 0.7, 0.9)
+    alpha = np.where(female, -0.241, -0.302)
+    ratio = scr_mgdl / kappa
+    return (
+        142.0
+        * np.power(np.minimum(ratio, 1.0), alpha)
+        * np.power(np.maximum(ratio, 1.0), -1.200)
+        * np.power(0.9938, age)
+        * np.where(female, 1.012, 1.0)
+    )
+
+
+def egfr_ckd_epi_2009_vec(
+    scr_mgdl: np.ndarray, age: np.ndarray, female: np.ndarray, black: np.ndarray
+) -> np.ndarray:
+    """CKD-EPI 2009 cho mảng."""
+    kappa = np.where(female, 0.7, 0.9)
+    alpha = np.where(female, -0.329, -0.411)
+    ratio = scr_mgdl / kappa
+    return (
+        141.0
+        * np.power(np.minimum(ratio, 1.0), alpha)
+        * np.power(np.maximum(ratio, 1.0), -1.209)
+        * np.power(0.993, age)
+        * np.where(female, 1.018, 1.0)
+        * np.where(black, 1.159, 1.0)
+    )
+
+
+def egfr_mdrd_idms_vec(
+    scr_mgdl: np.ndarray, age: np.ndarray, female: np.ndarray, black: np.ndarray
+) -> np.ndarray:
+    """MDRD (IDMS) cho mảng."""
+    return (
+        175.0
+        * np.power(scr_mgdl, -1.154)
+        * np.power(age, -0.203)
+        * np.where(female, 0.742, 1.0)
+        * np.where(black, 1.212, 1.0)
+    )
+
+
+def crcl_cockcroft_gault_vec(
+    scr_mgdl: np.ndarray, age: np.ndarray, female: np.ndarray, weight_kg: np.ndarray
+) -> np.ndarray:
+    """Cockcroft–Gault cho mảng (mL/min, không chuẩn hoá 1.73m²)."""
     crcl = ((140.0 - age) * weight_kg) / (72.0 * scr_mgdl)
-    if sex == "female":
-        crcl *= 0.85
-    return crcl
+    return crcl * np.where(female, 0.85, 1.0)
 
 
-@dataclass
+# bộ mẫu đối chiếu kernel Numba với bản NumPy: hai bên κ, ngưỡng tuổi, NaN
+_KERNEL_PROBE_SCR: Final = np.array([0.3, 0.7, 0.7, 0.9, 0.9, 1.0, 2.5, 20.0, np.nan])
+_KERNEL_PROBE_AGE: Final = np.array([18, 40, 40, 55, 55, 70, 85, 100, 40], dtype=np.int64)
+_KERNEL_PROBE_FEMALE: Final = np.array([True, True, False, True, False, True, False, True, False])
+
+
+@lru_cache(maxsize=None)
+def _load_2021_batch_kernel() -> Callable[[np.ndarray, np.ndarray, np.ndarray], np.ndarray]:
+    # nạp khi gọi tính theo lô lần đầu: import numba tốn ~100 ms, app (tính đơn lẻ) không cần
+    try:  # numba là tuỳ chọn: chỉ dùng để tăng tốc tính theo lô
+        from src.egfr_numba import egfr_ckd_epi_2021_numba
+    except ImportError:
+        return egfr_ckd_epi_2021_vec
+    # chỉ dùng kernel nếu khớp bản NumPy trên bộ mẫu (kể cả NaN), tránh hai bản lệch nhau
+    probe = (_KERNEL_PROBE_SCR, _KERNEL_PROBE_AGE, _KERNEL_PROBE_FEMALE)
+    if not np.allclose(egfr_ckd_epi_2021_numba(*probe), egfr_ckd_epi_2021_vec(*probe), rtol=1e-9, equal_nan=True):
+        return egfr_ckd_epi_2021_vec
+    return egfr_ckd_epi_2021_numba
+
+
+# -------------------------
+# Method dispatch
+# -------------------------
+
+def _run_ckd_epi_2021(scr_mgdl: float, age: int, sex: Sex, black: bool, weight_kg: Optional[float]) -> float:
+    return egfr_ckd_epi_2021(scr_mgdl, age, sex)
+
+
+def _run_ckd_epi_2009(scr_mgdl: float, age: int, sex: Sex, black: bool, weight_kg: Optional[float]) -> float:
+    return egfr_ckd_epi_2009(scr_mgdl, age, sex, black=black)
+
+
+def _run_mdrd_idms(scr_mgdl: float, age: int, sex: Sex, black: bool, weight_kg: Optional[float]) -> float:
+    return egfr_mdrd_idms(scr_mgdl, age, sex, black=black)
+
+
+def _run_cockcroft_gault(scr_mgdl: float, age: int, sex: Sex, black: bool, weight_kg: Optional[float]) -> float:
+    assert weight_kg is not None  # compute_kidney_function đã kiểm tra (needs_weight)
+    return crcl_cockcroft_gault(scr_mgdl, age, sex, weight_kg=weight_kg)
+
+
+_Runner = Callable[[float, int, Sex, bool, Optional[float]], float]
+
+# method -> (runner, đơn vị, ghi chú, dùng hệ số "Black", cần cân nặng)
+_METHOD_TABLE: Final[Dict[Method, Tuple[_Runner, str, str, bool, bool]]] = {
+    "CKD-EPI 2021": (
+        _run_ckd_epi_2021,
+        "mL/min/1.73m²",
+        "eGFR chuẩn hoá 1.73m² (CKD-EPI 2021, không chủng tộc).",
+        False,
+        False,
+    ),
+    "CKD-EPI 2009": (
+        _run_ckd_epi_2009,
+        "mL/min/1.73m²",
+        "eGFR chuẩn hoá 1.73m² (CKD-EPI 2009). Có tuỳ chọn hệ số người da đen.",
+        True,
+        False,
+    ),
+    "MDRD (IDMS)": (
+        _run_mdrd_idms,
+        "mL/min/1.73m²",
+        "eGFR chuẩn hoá 1.73m² (MDRD IDMS). Có tuỳ chọn hệ số người da đen.",
+        True,
+        False,
+    ),
+    "Cockcroft-Gault": (
+        _run_cockcroft_gault,
+        "mL/min",
+        "CrCl (Cockcroft–Gault) KHÔNG chuẩn hoá 1.73m²; thường dùng chỉnh liều thuốc.",
+        False,
+        True,
+    ),
+}
+
+
+# method -> hàm tính theo mảng (scr_mgdl, age, female, black, weight_kg)
+_VEC_RUNNERS: Final[Dict[Method, Callable[[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray], np.ndarray]]] = {
+    "CKD-EPI 2021": lambda scr, age, female, black, w: _load_2021_batch_kernel()(scr, age, female),
+    "CKD-EPI 2009": lambda scr, age, female, black, w: egfr_ckd_epi_2009_vec(scr, age, female, black),
+    "MDRD (IDMS)": lambda scr, age, female, black, w: egfr_mdrd_idms_vec(scr, age, female, black),
+    "Cockcroft-Gault": lambda scr, age, female, black, w: crcl_cockcroft_gault_vec(scr, age, female, w),
+}
+
+
+@dataclass(frozen=True, slots=True)
 class KidneyResult:
     timestamp: str
     method: Method
@@ -128,6 +300,55 @@ class KidneyResult:
     notes: str
 
 
+@dataclass
+class KidneyResultColumns:
+    """
+    Kết quả tính theo lô, lưu theo cột (struct-of-arrays): mỗi trường là một mảng liền
+    kiểu hẹp thay vì N đối tượng KidneyResult. Các trường cố định theo công thức
+    (method, value_unit, notes) chỉ lưu một lần.
+    """
+
+    timestamp: np.ndarray  # datetime64[s]
+    method: Method
+    age: np.ndarray  # int16
+    sex: np.ndarray  # str
+    scr_value: np.ndarray  # float32
+    scr_unit: np.ndarray  # str
+    scr_mgdl: np.ndarray  # float32
+    black: Optional[np.ndarray]  # bool; None nếu công thức không dùng hệ số "Black"
+    weight_kg: Optional[np.ndarray]  # float32; chỉ có với Cockcroft–Gault
+    value: np.ndarray  # float32
+    value_unit: str
+    stage: np.ndarray  # str
+    stage_text: np.ndarray  # str
+    notes: str
+
+    def __len__(self) -> int:
+        return self.value.size
+
+    def to_frame(self) -> pd.DataFrame:
+        """Ghép các cột thành DataFrame (cùng thứ tự cột với file lịch sử)."""
+        n = len(self)
+        return pd.DataFrame(
+            {
+                "timestamp": self.timestamp,
+                "method": pd.Categorical([self.method] * n),
+                "age": self.age,
+                "sex": pd.Categorical(self.sex),
+                "scr_value": self.scr_value,
+                "scr_unit": pd.Categorical(self.scr_unit),
+                "scr_mgdl": self.scr_mgdl,
+                "black": pd.array([pd.NA] * n, dtype="boolean") if self.black is None else self.black,
+                "weight_kg": np.full(n, np.nan, dtype=np.float32) if self.weight_kg is None else self.weight_kg,
+                "value": self.value,
+                "value_unit": self.value_unit,
+                "stage": pd.Categorical(self.stage),
+                "stage_text": self.stage_text,
+                "notes": self.notes,
+            }
+        )
+
+
 def compute_kidney_function(
     method: Method,
     age: int,
@@ -139,46 +360,26 @@ def compute_kidney_function(
 ) -> KidneyResult:
     scr_mgdl = scr_to_mgdl(scr_value, scr_unit)
 
-    if method == "CKD-EPI 2021":
-        val = egfr_ckd_epi_2021(scr_mgdl, age, sex)
-        unit = "mL/min/1.73m²"
-        notes = "eGFR chuẩn hoá 1.73m² (CKD-EPI 2021, không chủng tộc)."
-        stage, stage_text = gfr_stage_g1_g5(val)
-        blk = None
-        w = None
-
-    elif method == "CKD-EPI 2009":
-        val = egfr_ckd_epi_2009(scr_mgdl, age, sex, black=black)
-        unit = "mL/min/1.73m²"
-        notes = "eGFR chuẩn hoá 1.73m² (CKD-EPI 2009). Có tuỳ chọn hệ số người da đen."
-        stage, stage_text = gfr_stage_g1_g5(val)
-        blk = black
-        w = None
-
-    elif method == "MDRD (IDMS)":
-        val = egfr_mdrd_idms(scr_mgdl, age, sex, black=black)
-        unit = "mL/min/1.73m²"
-        notes = "eGFR chuẩn hoá 1.73m² (MDRD IDMS). Có tuỳ chọn hệ số người da đen."
-        stage, stage_text = gfr_stage_g1_g5(val)
-        blk = black
-        w = None
-
-    elif method == "Cockcroft-Gault":
+    spec = _METHOD_TABLE.get(method)
+    if spec is None:
+        raise ValueError("Phương pháp không hợp lệ.")
+    runner, unit, notes, uses_black, needs_weight = spec
+    # kiểm tra tuổi một lần ở đây; các hàm công thức không kiểm tra lại
+    if age < 18:
+        raise ValueError(f"{method}: áp dụng cho người lớn (>=18 tuổi).")
+
+    w: Optional[float] = None
+    if needs_weight:
         if weight_kg is None:
             raise ValueError("Cockcroft–Gault cần nhập cân nặng.")
-        val = crcl_cockcroft_gault(scr_mgdl, age, sex, weight_kg=weight_kg)
-        unit = "mL/min"
-        notes = "CrCl (Cockcroft–Gault) KHÔNG chuẩn hoá 1.73m²; thường dùng chỉnh liều thuốc."
-        # phân độ G1–G5 dùng gần đúng theo ngưỡng eGFR (chỉ để tham khảo)
-        stage, stage_text = gfr_stage_g1_g5(val)
-        blk = None
         w = float(weight_kg)
-
-    else:
-        raise ValueError("Phương pháp không hợp lệ.")
+    val = runner(scr_mgdl, age, sex, black, w)
+    # với CrCl (Cockcroft–Gault) phân độ G1–G5 chỉ mang tính gần đúng (tham khảo)
+    stage, stage_text = gfr_stage_g1_g5(val)
+    blk = black if uses_black else None
 
     return KidneyResult(
-        timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        timestamp=datetime.now().isoformat(sep=" ", timespec="seconds"),
         method=method,
         age=age,
         sex=sex,
@@ -193,3 +394,82 @@ def compute_kidney_function(
         stage_text=stage_text,
         notes=notes,
     )
+
+
+def compute_kidney_function_batch(
+    method: Method,
+    age: Sequence[int],
+    sex: Sequence[Sex],
+    scr_value: Sequence[float],
+    scr_unit: Sequence[ScrUnit],
+    black: Optional[Sequence[bool]] = None,
+    weight_kg: Optional[Sequence[float]] = None,
+) -> KidneyResultColumns:
+    """
+    Tính cùng một công thức cho nhiều bệnh nhân (mỗi tham số là một cột).
+    Phần số học chạy theo mảng (NumPy; CKD-EPI 2021 dùng kernel Numba nếu có cài numba).
+    """
+    spec = _METHOD_TABLE.get(method)
+    if spec is None:
+        raise ValueError("Phương pháp không hợp lệ.")
+    _, unit, notes, uses_black, needs_weight = spec
+
+    if needs_weight and weight_kg is None:
+        raise ValueError("Cockcroft–Gault cần nhập cân nặng.")
+
+    # đọc tuổi dưới dạng float để kiểm tra NaN (ô trống trong CSV) trước khi ép sang int
+    age_f = np.asarray(age, dtype=np.float64)
+    sex_arr = np.asarray(sex)
+    scr_arr = np.asarray(scr_value, dtype=np.float64)
+    unit_arr = np.asarray(scr_unit)
+    columns = [age_f, sex_arr, scr_arr, unit_arr]
+    if black is not None:
+        black_arr = np.asarray(black, dtype=bool)
+        columns.append(black_arr)
+    if needs_weight:
+        weight_arr = np.asarray(weight_kg, dtype=np.float64)
+        columns.append(weight_arr)
+
+    # mọi cột phải là dãy 1 chiều cùng độ dài (tránh broadcast ngầm / lỗi sâu trong NumPy, Numba)
+    n = scr_arr.shape[0] if scr_arr.ndim == 1 else -1
+    if any(col.ndim != 1 or col.shape[0] != n for col in columns):
+        raise ValueError("Các cột đầu vào phải là dãy 1 chiều có cùng độ dài.")
+
+    if black is None:
+        black_arr = np.zeros(n, dtype=bool)
+    if not needs_weight:
+        weight_arr = np.full(n, np.nan)
+
+    # dạng "không phải tất cả hợp lệ" để loại cả NaN/inf (so sánh với NaN luôn False)
+    if not np.all(np.isfinite(scr_arr) & (scr_arr > 0)):
+        raise ValueError("Creatinine phải > 0.")
+    if not np.all(np.isfinite(age_f) & (age_f >= 18)):
+        raise ValueError(f"{method}: áp dụng cho người lớn (>=18 tuổi).")
+    if needs_weight and not np.all(np.isfinite(weight_arr) & (weight_arr > 0)):
+        raise ValueError("Cân nặng phải > 0.")
+    age_arr = age_f.astype(np.int64)
+
+    scr_mgdl = np.where(unit_arr == "umol/L", scr_arr / 88.4, scr_arr)
+    female = sex_arr == "female"
+    vals = _VEC_RUNNERS[method](scr_mgdl, age_arr, female, black_arr, weight_arr)
+    stage_idx = np.searchsorted(_GFR_THRESHOLDS, vals, side="right")
+
+    stages = np.array(_GFR_STAGES)[stage_idx]
+
+    timestamp = np.datetime64(datetime.now(), "s")
+    return KidneyResultColumns(
+        timestamp=np.full(scr_arr.shape, timestamp),
+        method=method,
+        age=age_arr.astype(np.int16),
+        sex=sex_arr,
+        scr_value=scr_arr.astype(np.float32),
+        scr_unit=unit_arr,
+        scr_mgdl=scr_mgdl.astype(np.float32),
+        black=black_arr if uses_black else None,
+        weight_kg=weight_arr.astype(np.float32) if needs_weight else None,
+        value=vals.astype(np.float32),
+        value_unit=unit,
+        stage=stages[:, 0],
+        stage_text=stages[:, 1],
+        notes=notes,
+    )
@@ -0,0 +1,25 @@
+"""
+Kernel Numba (tuỳ chọn) cho tính eGFR theo lô.
+
+Tách riêng khỏi src/egfr.py vì numba cần bytecode Python của hàm, còn egfr.py có thể
+được biên dịch bằng mypyc. Module này chỉ import được khi đã cài numba.
+"""
+
+import numba
+import numpy as np
+
+
+# fastmath không gồm "nnan"/"ninf": NaN vẫn lan truyền như bản NumPy thay vì ra số giả
+@numba.njit(cache=True, fastmath={"contract", "afn", "reassoc", "nsz", "arcp"}, parallel=True)
+def egfr_ckd_epi_2021_numba(scr, age, female):
+    """CKD-EPI 2021 cho mảng, vòng lặp song song biên dịch bởi Numba."""
+    out = np.empty_like(scr)
+    for i in numba.prange(scr.size):
+        k = 0.7 if female[i] else 0.9
+        a = -0.241 if female[i] else -0.302
+        r = scr[i] / k
+        # viết dạng "not >=" / "not <=" để NaN lan truyền giống np.minimum / np.maximum
+        mn = r if not r >= 1.0 else 1.0
+        mx = r if not r <= 1.0 else 1.0
+        out[i] = 142.0 * mn**a * mx**-1.200 * 0.9938 ** age[i] * (1.012 if female[i] else 1.0)
+    return out